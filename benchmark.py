@@ -0,0 +1,179 @@
+import sys
+import time
+
+import numpy as np
+import taichi as ti
+
+from linkage_ti import cases, ui
+from linkage_ti.linkage import Linkage, VertexType
+
+ui.init(arch=ti.cpu)
+
+case_names = [factory.__name__ for factory in cases.factories]
+
+
+def build(name: str, precision) -> Linkage:
+    # factories mutate their vertex infos while solving, so every run gets a fresh linkage
+    Linkage.default_precision = precision
+    try:
+        return getattr(cases, name)()
+    finally:
+        Linkage.default_precision = ti.f32
+
+
+def intersect_of_circle_ld(x1, y1, r1, x2, y2, r2):
+    # `utils.intersect_of_circle` in extended precision (80 bit on x86, only float64 where long double is)
+    d = np.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
+    A = (r1 ** 2 - r2 ** 2 + d ** 2) / (2 * d)
+    h = np.sqrt(r1 ** 2 - A ** 2)
+
+    a2 = x1 + A * (x2 - x1) / d
+    b2 = y1 + A * (y2 - y1) / d
+    a3 = a2 - h * (y2 - y1) / d
+    b3 = b2 + h * (x2 - x1) / d
+    a4 = a2 + h * (y2 - y1) / d
+    b4 = b2 - h * (x2 - x1) / d
+
+    return [a3, b3], [a4, b4]
+
+
+def reference_cycle(name: str, steps: int) -> np.ndarray:
+    """ positions of step 0 .. steps-1 solved like `Linkage.solve_vertex`, but in np.longdouble """
+    infos = build(name, ti.f32).vertex_infos
+    ld = np.longdouble
+    cycle = np.zeros((steps, len(infos), 2), dtype=ld)
+    for step in range(steps):
+        pos = cycle[step]
+        for i, info in enumerate(infos):
+            if info.tp == VertexType.Fixed:
+                pos[i] = [ld(info.param[0]), ld(info.param[1])]
+            elif info.tp == VertexType.Driver:
+                x0, y0, r, theta0, theta1 = [ld(p) for p in info.param]
+                span = theta1 - theta0
+                theta = span - abs(span - ld(step) * ld(0.01) % (span * 2)) + theta0
+                pos[i] = [x0 + r * np.cos(theta), y0 + r * np.sin(theta)]
+            else:
+                id1, r1, id2, r2, hint = info.param[:5]
+                (x1, y1), (x2, y2) = pos[id1], pos[id2]
+                both = intersect_of_circle_ld(x1, y1, ld(r1), x2, y2, ld(r2))
+                x3, y3 = both[hint]
+                if len(info.param) == 6:  # same anti-hint choice as `solve_vertex`
+                    x0, y0 = pos[info.param[5]]
+                    x3d, y3d = both[1 - hint]
+                    diff1 = abs((y1 - y0) * (x3 - x2) - (y3 - y2) * (x1 - x0))
+                    diffd = abs((y1 - y0) * (x3d - x2) - (y3d - y2) * (x1 - x0))
+                    if diffd + 1e-3 < diff1:
+                        x3, y3 = x3d, y3d
+                        info.param[4] = 1 - info.param[4]
+                pos[i] = [x3, y3]
+    return cycle
+
+
+def bench_precision(name: str, steps: int):
+    # reference: the same solver in extended precision, so that the f64 error is measured too
+    expected = reference_cycle(name, steps)
+
+    for precision in [ti.f32, ti.f64]:
+        linkage = build(name, precision)
+        linkage.substep(0)  # warm up, field setup and kernel compilation stay out of the timing
+        error = 0.0
+        elapsed = 0.0
+        for step in range(steps):
+            start = time.perf_counter()
+            linkage.substep(step)
+            elapsed += time.perf_counter() - start
+            error = max(error, float(np.abs(linkage.solve_vertices.to_numpy()[:, :2] - expected[step]).max()))
+        print(f"{name:28s} {str(precision):4s} N={linkage.N:4d} {steps / elapsed:10.1f} steps/s "
+              f"max error {error:.3e}")
+
+
+def bench_codegen(name: str, steps: int):
+    # f64, so that both keep python doubles and the diff shows the generated code solves the same linkage
+    interpreted = build(name, ti.f64)
+    compiled = build(name, ti.f64)
+    compiled.compile()
+
+    times = {}
+    for linkage in [interpreted, compiled]:
+        linkage.substep(0)  # warm up
+        start = time.perf_counter()
+        for step in range(steps):
+            linkage.substep(step)
+        times[id(linkage)] = (time.perf_counter() - start) / steps
+    error = np.abs(interpreted.solve_vertices.to_numpy() - compiled.solve_vertices.to_numpy()).max()
+    print(f"{name:28s} N={interpreted.N:4d} substep {times[id(interpreted)] * 1e6:9.1f}us "
+          f"compiled {times[id(compiled)] * 1e6:9.1f}us x{times[id(interpreted)] / times[id(compiled)]:6.1f} "
+          f"diff {error:.3e}")
+
+
+windows = []
+
+
+def get_window():
+    # one hidden window for all cases, None if GGUI can't run here (e.g. no vulkan)
+    if not windows:
+        try:
+            windows.append(ti.ui.Window("benchmark", (ui.windowSize, ui.windowSize), show_window=False))
+        except RuntimeError as e:
+            print("GGUI unavailable, software only:", e)
+            windows.append(None)
+    return windows[0]
+
+
+def bench_render(name: str, steps: int):
+    linkage = build(name, ti.f32)
+    window = get_window()
+    canvas = window.get_canvas() if window is not None else None
+
+    driverColor = ti.math.vec3(ti.hex_to_rgb(0xd88c9a))
+    trackColor = ti.math.vec3(ti.hex_to_rgb(0x38a3a5))
+    lineColor = ti.math.vec3(ti.hex_to_rgb(0x22577a))
+    cursor = ti.math.vec2(-1e6, -1e6)
+    trackedPoints = ui.create_tracked_points(linkage)
+    for step in range(120):
+        linkage.substep(step)
+        ui.get_tracked_points(linkage.get_vertices(), linkage.get_istracked(), trackedPoints, step)
+
+    def software(step: int):
+        ui.paint_frame(linkage, step, trackedPoints, cursor, 0, 0, driverColor, trackColor, lineColor, 0.7, 20, 10, 15)
+        if canvas is not None:
+            canvas.set_image(ui.pixels)
+            window.get_image_buffer_as_numpy()
+        else:
+            ui.pixels.to_numpy()
+
+    renderer = ui.GguiRenderer(linkage, trackedPoints, lineColor)
+
+    def ggui(step: int):
+        renderer.draw(canvas, driverColor, trackColor, 0.7, 20, 10, 15)
+        window.get_image_buffer_as_numpy()
+
+    times = {'software': None, 'ggui': None}
+    for backend, frame in [('software', software), ('ggui', ggui)]:
+        if backend == 'ggui' and canvas is None:
+            continue
+        frame(0)  # warm up
+        elapsed = 0.0
+        for step in range(steps):
+            linkage.substep(step)
+            start = time.perf_counter()
+            frame(step)
+            elapsed += time.perf_counter() - start
+        times[backend] = elapsed / steps
+    print(f"{name:28s} N={linkage.N:4d} " + " ".join(f"{backend} {t * 1e3:8.2f}ms" if t is not None else
+                                                     f"{backend}      n/a" for backend, t in times.items()))
+
+
+benches = {'precision': bench_precision, 'codegen': bench_codegen, 'render': bench_render}
+
+
+# usage: python3 benchmark.py [steps] [precision|codegen|render ...]
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    for bench in sys.argv[2:] or benches.keys():
+        for name in case_names:
+            benches[bench](name, steps)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from .linkage import Linkage
+
+
+# curve quality of traced vertices, every function takes points of shape (..., n, 2) and works on a batch of
+# trajectories at once, e.g. (runs, steps, 2)
+
+def trace(linkage: Linkage, steps: int, ids: List[int] = None) -> np.ndarray:
+    """ solve `steps` steps and return positions of vertices `ids` (default: tracked vertices)
+
+    :return: array of shape (len(ids), steps, 2), (0, steps, 2) if nothing is tracked
+    """
+    if ids is None:
+        if linkage.get_trackedNum() == 0:
+            return np.zeros((0, steps, 2))
+        ids = np.flatnonzero(linkage.get_istracked().to_numpy()[:, 0])
+    linkage.cache_cycle(steps)
+    return linkage.get_cycle()[:, ids, :2].transpose(1, 0, 2)
+
+
+def deviation(residuals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ return max absolute and root mean square of residuals along the last axis """
+    residuals = np.abs(residuals)
+    return residuals.max(axis=-1), np.sqrt(np.mean(residuals * residuals, axis=-1))
+
+
+def straightness(points: np.ndarray) -> np.ndarray:
+    """ distance of each point to the best fitting line (total least squares) of its trajectory """
+    centered = points - points.mean(axis=-2, keepdims=True)
+    covariance = np.einsum('...ni,...nj->...ij', centered, centered)
+    # eigh sorts eigenvalues ascending, the first eigenvector is the normal of the line
+    normal = np.linalg.eigh(covariance)[1][..., :, 0]
+    return np.einsum('...ni,...i->...n', centered, normal)
+
+
+def line_residual(points: np.ndarray, k: float, b: float) -> np.ndarray:
+    """ y - (kx + b) """
+    return points[..., 1] - (k * points[..., 0] + b)
+
+
+def square_residual(points: np.ndarray, k: float = 1.0, origin: Tuple[float, float] = (0.0, 0.0)) -> np.ndarray:
+    """ y - kx^2, in coordinates relative to `origin` """
+    x = points[..., 0] - origin[0]
+    y = points[..., 1] - origin[1]
+    return y - k * x * x
+
+
+def inverse_residual(points: np.ndarray, k: float = 1.0, origin: Tuple[float, float] = (0.0, 0.0)) -> np.ndarray:
+    """ y - k/x, in coordinates relative to `origin` """
+    x = points[..., 0] - origin[0]
+    y = points[..., 1] - origin[1]
+    return y - k / x
+
+
+def coverage(xs: np.ndarray, low: float, high: float, bins: int = 100) -> np.ndarray:
+    """ fraction of `bins` equal parts of [low, high] visited by xs, along the last axis """
+    index = np.floor((xs - low) / (high - low) * bins).astype(np.int64)
+    inside = (index >= 0) & (index < bins)
+    hit = np.zeros(xs.shape[:-1] + (bins,), dtype=bool)
+    rows = np.broadcast_to(np.arange(int(np.prod(xs.shape[:-1]))).reshape(xs.shape[:-1] + (1,)), xs.shape)
+    hit.reshape(-1, bins)[rows[inside], index[inside]] = True
+    return hit.mean(axis=-1)
@@ -2,6 +2,7 @@ import math
 
 from .builder import LinkageBuilder
 from .linkage import Linkage, VertexInfo, VertexType
+from .scene import Scene
 
 
 def linkage0() -> Linkage:
@@ -179,10 +180,10 @@ def Zoomer(multiple: float = 0.5) -> Linkage:
     return Linkage(info, extra_lines, None, [5, 10], 2)
 
 
-def Mover() -> Linkage:
+def Mover(start: float = -10, end: float = 10) -> Linkage:
     builder = LinkageBuilder()
     # o = builder.add_origin()
-    x = builder.add_straight_line(-10, 10)
+    x = builder.add_straight_line(start, end)
     # x = builder.add_mover(x, 2, 2)
     x = builder.add_mover(x, -5, 4)
     # x = builder.add_mover(x, 6, -3)
@@ -251,9 +252,9 @@ def basic_adder() -> Linkage:
     return builder.get_linkage()
 
 
-def Line() -> Linkage:
+def Line(start: float = 1, end: float = 5) -> Linkage:
     builder = LinkageBuilder()
-    x = builder.add_straight_line(1, 5)
+    x = builder.add_straight_line(start, end)
 
     o = builder.add_fixed()
     return builder.get_linkage()
@@ -296,3 +297,29 @@ def taichi() -> Linkage:
          ch_i1_0, ch_i1_1, ch_i1_2])
 
     return b.get_linkage()
+
+
+# factories of single linkages, e.g. for `main.py` and `benchmark.py`
+factories = [linkage0, linkage1, GrashofFourBarLinkage, PeaucellierStraightLinkage, Axes, Adder, Zoomer, Mover,
+             YEqualKxAddB, Squarer, YEqInvX, basic_adder, Line, taichi]
+
+
+# all cases in one scene, laid out in a grid that fits the default view of `ui.show`
+def gallery(columns: int = 4, cell: float = 9.6) -> Scene:
+    palette = [(0.28, 0.68, 0.99), (0.68, 0.99, 0.28), (0.99, 0.28, 0.68), (0.99, 0.68, 0.28)]
+
+    linkages, offsets, scales, colors = [], [], [], []
+    for k, factory in enumerate(factories):
+        linkage = factory()
+        pos = linkage.solve(0)[:, :2]
+        low, high = pos.min(axis=0), pos.max(axis=0)
+        scale = cell * 0.8 / max(high[0] - low[0], high[1] - low[1], 1e-3)
+        center = (low + high) / 2
+
+        row, column = divmod(k, columns)
+        linkages.append(linkage)
+        scales.append(scale)
+        offsets.append((-10 + cell * (column + 0.5) - center[0] * scale, 23.4 - cell * (row + 0.5) - center[1] * scale))
+        colors.append(palette[k % len(palette)])
+
+    return Scene(linkages, offsets, scales, colors)
@@ -0,0 +1,104 @@
+import math
+from collections import OrderedDict
+from typing import Callable, List, Tuple
+
+from .linkage import Linkage, VertexInfo, VertexType
+from .utils import NoIntersectionError, derivatives_of_intersection
+
+# compiled solvers, keyed by linkage structure, least recently used ones are dropped beyond `max_solvers`
+solvers: 'OrderedDict[Tuple, Callable]' = OrderedDict()
+max_solvers = 64
+
+
+def structure_of(infos: List[VertexInfo]) -> Tuple:
+    # hints of vertices with anti-hint change while solving, they are read at runtime and not part of the structure
+    key = []
+    for info in infos:
+        param = list(info.param)
+        if info.tp == VertexType.Driven and len(param) == 6:
+            param[4] = None
+        key.append((info.tp.value, tuple(param)))
+    return tuple(key)
+
+
+def generate(infos: List[VertexInfo], kinematics: bool = False) -> str:
+    """ generate source of `solve(step, infos) -> [x0, y0, 0, x1, y1, 0, ...]`
+
+    The linkage is unrolled into straight-line code, radii, parent ids and Fixed positions are constants.
+    `infos` is only used for hints of vertices with anti-hint, which are flipped in place like `Linkage.solve_vertex`.
+    With `kinematics`, solve returns (positions, [vx0, vy0, ax0, ay0, vx1, ...]) instead, see
+    `Linkage.enable_kinematics`.
+    """
+    lines = ["def solve(step, infos):"]
+    for i, info in enumerate(infos):
+        p = info.param
+        lines.append(f"    # {i}: {info.tp.name}")
+        if info.tp == VertexType.Fixed:
+            lines.append(f"    x{i} = {float(p[0])!r}")
+            lines.append(f"    y{i} = {float(p[1])!r}")
+            if kinematics:
+                lines.append(f"    vx{i} = vy{i} = ax{i} = ay{i} = 0.0")
+        elif info.tp == VertexType.Driver:
+            cycle = p[4] - p[3]
+            lines.append(f"    theta = {cycle!r} - abs({cycle!r} - step * 0.01 % {cycle * 2!r}) + {float(p[3])!r}")
+            lines.append(f"    dx = {float(p[2])!r} * cos(theta)")
+            lines.append(f"    dy = {float(p[2])!r} * sin(theta)")
+            lines.append(f"    x{i} = {float(p[0])!r} + dx")
+            lines.append(f"    y{i} = {float(p[1])!r} + dy")
+            if kinematics:
+                lines.append(f"    vx{i}, vy{i}, ax{i}, ay{i} = -dy, dx, -dx, -dy")
+        else:
+            id1, r1, id2, r2, hint = p[:5]
+            # same formula as `intersect_of_circle`, the first intersection is on the left of p1 -> p2
+            lines.append(f"    dx = x{id2} - x{id1}")
+            lines.append(f"    dy = y{id2} - y{id1}")
+            lines.append(f"    d = sqrt(dx * dx + dy * dy)")
+            lines.append(f"    if not {abs(r1 - r2)!r} <= d <= {r1 + r2!r}:")
+            lines.append(f"        raise NoIntersectionError('circles of vertex {i} don\\'t intersect at step %d' % step)")
+            lines.append(f"    a = ({r1 * r1 - r2 * r2!r} + d * d) / (2 * d)")
+            lines.append(f"    h = sqrt({r1 * r1!r} - a * a) / d")
+            lines.append(f"    mx = x{id1} + a * dx / d")
+            lines.append(f"    my = y{id1} + a * dy / d")
+            if len(p) == 5:
+                sign = 1 - 2 * hint
+                lines.append(f"    x{i} = mx - {sign} * h * dy")
+                lines.append(f"    y{i} = my + {sign} * h * dx")
+            else:
+                anti = p[5]
+                lines.append(f"    sign = 1 - 2 * infos[{i}].param[4]")
+                lines.append(f"    x{i} = mx - sign * h * dy")
+                lines.append(f"    y{i} = my + sign * h * dx")
+                lines.append(f"    xd = mx + sign * h * dy")
+                lines.append(f"    yd = my - sign * h * dx")
+                lines.append(f"    diff1 = abs((y{id1} - y{anti}) * (x{i} - x{id2}) - (y{i} - y{id2}) * (x{id1} - x{anti}))")
+                lines.append(f"    diffd = abs((y{id1} - y{anti}) * (xd - x{id2}) - (yd - y{id2}) * (x{id1} - x{anti}))")
+                lines.append(f"    if diffd + 1e-3 < diff1:")
+                lines.append(f"        x{i} = xd")
+                lines.append(f"        y{i} = yd")
+                lines.append(f"        infos[{i}].param[4] = 1 - infos[{i}].param[4]")
+            if kinematics:
+                lines.append(f"    vx{i}, vy{i}, ax{i}, ay{i} = derivatives_of_intersection("
+                             f"x{i}, y{i}, x{id1}, y{id1}, vx{id1}, vy{id1}, ax{id1}, ay{id1}, "
+                             f"x{id2}, y{id2}, vx{id2}, vy{id2}, ax{id2}, ay{id2})")
+    positions = "[" + ", ".join(f"x{i}, y{i}, 0.0" for i in range(len(infos))) + "]"
+    if kinematics:
+        derivatives = "[" + ", ".join(f"vx{i}, vy{i}, ax{i}, ay{i}" for i in range(len(infos))) + "]"
+        lines.append(f"    return {positions}, {derivatives}")
+    else:
+        lines.append(f"    return {positions}")
+    return "\n".join(lines) + "\n"
+
+
+def compile_solver(linkage: Linkage, kinematics: bool = False) -> Callable:
+    """ return the generated `solve(step, infos)` of linkage, compiled once per structure """
+    key = (structure_of(linkage.vertex_infos), kinematics)
+    if key in solvers:
+        solvers.move_to_end(key)
+        return solvers[key]
+    scope = {"cos": math.cos, "sin": math.sin, "sqrt": math.sqrt,
+             "derivatives_of_intersection": derivatives_of_intersection, "NoIntersectionError": NoIntersectionError}
+    exec(compile(generate(linkage.vertex_infos, kinematics), "<linkage solver>", "exec"), scope)
+    solvers[key] = scope["solve"]
+    if len(solvers) > max_solvers:
+        solvers.popitem(last=False)
+    return solvers[key]
@@ -0,0 +1,133 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Union
+
+import numpy as np
+import taichi as ti
+
+from . import analysis, cases
+from .utils import NoIntersectionError
+
+
+# metrics take tracked trajectories of shape (tracked, steps, 2) and the factory params
+
+def default_metric(points: np.ndarray, params: Dict[str, float]) -> Dict[str, float]:
+    if len(points) == 0:
+        return {}
+    return {
+        "straightness": float(analysis.deviation(analysis.straightness(points))[0].max()),
+        "x_min": float(points[..., 0].min()),
+        "x_max": float(points[..., 0].max()),
+    }
+
+
+# for YEqualKxAddB: deviation of the last tracked vertex from y = kx + b
+def line_metric(points: np.ndarray, params: Dict[str, float]) -> Dict[str, float]:
+    maxError, rmsError = analysis.deviation(analysis.line_residual(points[-1], params["k"], params["b"]))
+    return {"max_error": float(maxError), "rms_error": float(rmsError)}
+
+
+def init_worker(arch: str):
+    # one taichi runtime per worker, each on a single thread so that workers scale with cores
+    ti.init(arch=getattr(ti, arch), cpu_max_num_threads=1)
+
+
+def run(case: Union[str, Callable], params: Dict[str, float], steps: int, metric: Callable) -> Dict:
+    # failures are recorded in the row, so that one bad run doesn't abort the sweep
+    row = dict(params)
+    row.update({"pid": os.getpid(), "failed": 1})
+    start = time.perf_counter()
+    try:
+        factory = getattr(cases, case) if isinstance(case, str) else case
+        linkage = factory(**params)
+        built = time.perf_counter()
+        row.update({"N": linkage.N, "build_s": built - start})
+        points = analysis.trace(linkage, steps)
+        row["solve_s"] = time.perf_counter() - built
+        row.update(metric(points, params))
+        row["failed"] = 0
+    except NoIntersectionError:  # these params can't be assembled
+        pass
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def explore(case: Union[str, Callable], grid: Dict[str, List[float]], steps: int = 600, workers: int = None,
+            arch: str = "cpu", metric: Callable = default_metric) -> List[Dict]:
+    """ build and solve `case` for every combination of params in `grid` on a process pool
+
+    :param case: name of a factory in cases.py, or a module-level function (**params) -> Linkage, e.g. one calling
+        `LinkageBuilder` methods with the params
+    :param grid: values of each factory param, e.g. {"k": [1, 2], "b": [-3, 0]} for `cases.YEqualKxAddB`, or
+        {"start": [0, 1], "end": [4, 6]} for `cases.Line` (the range of `LinkageBuilder.add_straight_line`)
+    :param metric: module-level function (points, params) -> dict of metrics, see `default_metric`
+    :return: one row per combination, in grid order
+    """
+    names = list(grid.keys())
+    combinations = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+    # taichi runtimes don't survive fork
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker, initargs=(arch,)) as pool:
+        futures = [pool.submit(run, case, params, steps, metric) for params in combinations]
+        return [future.result() for future in futures]
+
+
+def print_table(rows: List[Dict], steps: int, elapsed: float):
+    columns = []
+    for row in rows:
+        columns.extend(key for key in row if key not in columns and key not in ("pid", "error"))
+    print(" ".join(f"{column:>12s}" for column in columns))
+    for row in rows:
+        print(" ".join(f"{row[column]:12.5g}" if column in row else " " * 12 for column in columns))
+
+    errors = [(i, row["error"]) for i, row in enumerate(rows) if "error" in row]
+    if errors:
+        print()
+    for i, error in errors:
+        print(f"row {i}: {error}")
+
+    print()
+    for pid in sorted(set(row["pid"] for row in rows)):
+        runs = [row for row in rows if row["pid"] == pid]
+        busy = sum(row.get("build_s", 0) + row.get("solve_s", 0) for row in runs)
+        print(f"worker {pid}: {len(runs)} runs" + (f", {len(runs) * steps / busy:.1f} steps/s" if busy > 0 else ""))
+    print(f"total: {len(rows)} runs in {elapsed:.2f}s, {len(rows) * steps / elapsed:.1f} steps/s")
+
+
+def parse_values(text: str) -> List[float]:
+    # "1,2,3" or "start:stop:num"
+    if ":" in text:
+        start, stop, num = text.split(":")
+        return np.linspace(float(start), float(stop), int(num)).tolist()
+    return [float(value) for value in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="explore factory params of a case on a process pool")
+    parser.add_argument("case", help="name of a factory in linkage_ti/cases.py")
+    parser.add_argument("grid", nargs="*", help="param=v1,v2,... or param=start:stop:num")
+    parser.add_argument("--steps", type=int, default=600)
+    parser.add_argument("--workers", type=int, default=None, help="default: cpu count")
+    parser.add_argument("--arch", default="cpu")
+    parser.add_argument("--metric", choices=["default", "line"], default="default")
+    args = parser.parse_args()
+
+    grid = {}
+    for item in args.grid:
+        name, values = item.split("=")
+        grid[name] = parse_values(values)
+    metric = line_metric if args.metric == "line" else default_metric
+
+    start = time.perf_counter()
+    rows = explore(args.case, grid, args.steps, args.workers, args.arch, metric)
+    print_table(rows, args.steps, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,10 @@ import enum
 import math
 from typing import List, Tuple
 
+import numpy as np
 import taichi as ti
 
-from .utils import intersect_of_circle
+from .utils import NoIntersectionError, derivatives_of_intersection, intersect_of_circle
 
 
 @enum.unique
@@ -43,20 +44,51 @@ class VertexInfo:
         # self.step: int = 0
 
 
+@ti.kernel
+def copy_vertices(src: ti.template(), dst: ti.template()):
+    for i in src:
+        dst[i] = ti.cast(src[i], ti.f32)
+
+
 class Linkage:
+    # solve precision of linkages created without `precision`, e.g. by the factories in cases.py
+    default_precision = ti.f32
+    # substeps without edits before an edited compiled linkage is compiled again, see `set_vertex_param`
+    recompile_after = 60
+
     def __init__(self, vertex_infos: List[VertexInfo], lines: List[List[int]] = None,
-                 colors: List[Tuple[float, float, float]] = None, tracked: List[int] = None, driver: int = -1):
+                 colors: List[Tuple[float, float, float]] = None, tracked: List[int] = None, driver: int = -1,
+                 precision=None):
+        """
+        :param precision: dtype vertices are solved in, ti.f32 or ti.f64 (default: `Linkage.default_precision`),
+            with ti.f64 positions are kept in `solve_vertices` and copied to the f32 `vertices` for rendering
+        """
         self.N: int = len(vertex_infos)
         self.vertex_infos = vertex_infos
         self.vertices = ti.Vector.field(3, dtype=ti.f32, shape=self.N)
+        self.solve_vertices = self.vertices
+        self.precision = precision or Linkage.default_precision
+        if self.precision == ti.f64:
+            self.solve_vertices = ti.Vector.field(3, dtype=ti.f64, shape=self.N)
         self.driver = driver
         self.trackedNum = 0
+        self.step = 0
+        self.solved = None  # float64 positions of `step` from `solve`, fields may lag behind them in a `Scene`
+        self.cycle = None
+        self.solver = None
+        self.compiled = False
+        self.stableSteps = 0
+        self.pending = []  # ids of vertices edited (or relying on edited ones) since `solver` was compiled
+        self.kinematics = None
 
         print("N =", self.N)
 
         lines = lines or []
+        self.bar_index = {}  # Driven vertex id -> index of its two bars in line_indices
+        self.barsVersion = 0  # bumped when an edit moves bars, for views that keep a copy of line_indices
         for i in range(self.N):
             if self.vertex_infos[i].tp == VertexType.Driven:
+                self.bar_index[i] = len(lines)
                 lines.append([i, self.vertex_infos[i].param[0]])
                 lines.append([i, self.vertex_infos[i].param[2]])
         self.line_indices = ti.Vector.field(2, dtype=ti.i32, shape=len(lines))
@@ -68,50 +100,231 @@ class Linkage:
             for i in range(len(colors)):
                 self.colors[i] = colors[i]
 
+        self.tracked = ti.Vector.field(1, dtype=ti.u8, shape=self.N)
         if tracked is not None:
             self.trackedNum = len(tracked)
-            self.tracked = ti.Vector.field(1, dtype=ti.u8, shape=self.N)
             for i in range(len(tracked)):
                 self.tracked[tracked[i]][0] = 1
 
     # needn't topo sort, we assume that small-id vertex is never rely on large-id vertex
     def substep(self, step: int):
-        for i in range(self.N):
-            info = self.vertex_infos[i]
-            if info.tp == VertexType.Fixed:
-                self.vertices[i] = [info.param[0], info.param[1], 0]
-            elif info.tp == VertexType.Driver:
-                cycle = info.param[4] - info.param[3]
-                # theta = step * 0.01 % cycle + info.param[3]  # cycle
-                theta = cycle - abs(cycle - step * 0.01 % (cycle * 2)) + info.param[3]  # wander
-                self.vertices[i] = [info.param[0] + info.param[2] * math.cos(theta),
-                                    info.param[1] + info.param[2] * math.sin(theta), 0]
-            elif self.vertex_infos[i].tp == VertexType.Driven:
-                id1, r1, id2, r2, hint = info.param[:5]
-                x1, y1 = self.vertices[id1][0], self.vertices[id1][1]
-                x2, y2 = self.vertices[id2][0], self.vertices[id2][1]
-                x3, y3 = intersect_of_circle(x1, y1, r1, x2, y2, r2)[hint]
-                # if i == 5:
-                #     print(x3)  # 0.6799779794256628, 5.320021789745519
-
-                if len(info.param) == 6:  # if it can't form a Parallelogram, use the other intersection
-                    anti_hint = info.param[5]
-                    x0, y0 = self.vertices[anti_hint][0], self.vertices[anti_hint][1]
-
-                    x3d, y3d = intersect_of_circle(x1, y1, r1, x2, y2, r2)[1 - hint]
-                    diff1 = abs((y1 - y0) * (x3 - x2) - (y3 - y2) * (x1 - x0))
-                    diffd = abs((y1 - y0) * (x3d - x2) - (y3d - y2) * (x1 - x0))
-                    if diffd + 1e-3 < diff1:
-                        x3, y3 = x3d, y3d
-                        info.param[4] = 1 - info.param[4]
-                self.vertices[i] = [x3, y3, 0]
+        self.solve_vertices.from_numpy(self.solve(step).astype(self.numpy_dtype()))
+        self.sync_vertices()
+
+    def solve(self, step: int) -> np.ndarray:
+        """ solve all vertices at `step` without touching any field, e.g. for `Scene` to upload several at once
+
+        :return: float64 positions of shape (N, 3), kinematics (if enabled) are kept in `self.kinematics`
+        """
+        if self.pending:
+            self.stableSteps += 1
+            if self.stableSteps >= Linkage.recompile_after:
+                self.compile()
+        positions = None
+        if self.solver is not None:
+            positions = self.run_solver(step)
+        if positions is None:
+            positions = [None] * self.N
+            self.solve_ids(range(self.N), step, positions)
+        self.step = step
+        self.solved = np.array(positions, dtype=np.float64).reshape(self.N, 3)
+        return self.solved
+
+    def run_solver(self, step: int):
+        """ solve with `solver`, vertices in `pending` are solved again over its positions by `solve_vertex`
+
+        :return: positions in a flat list or rows, None if a solver predating edits fails (the old geometry may not
+            assemble where the edited one does)
+        """
+        # the solver flips hints of edited vertices by their old geometry, put them back for `solve_vertex`
+        hints = [(i, self.vertex_infos[i].param[4]) for i in self.pending
+                 if self.vertex_infos[i].tp == VertexType.Driven]
+        try:
+            positions = self.solver(step, self.vertex_infos)
+        except (NoIntersectionError, ValueError, ZeroDivisionError) as e:
+            if self.pending:
+                return None
+            if isinstance(e, NoIntersectionError):
+                raise
+            # tangent circles off by rounding, or with the same center
+            raise NoIntersectionError(f"Two circles have no intersection at step {step}") from e
+        finally:
+            for i, hint in hints:
+                self.vertex_infos[i].param[4] = hint
+        if self.kinematics is not None:
+            positions, kinematics = positions
+            self.kinematics[:] = np.array(kinematics).reshape(self.N, 4)
+        if self.pending:
+            positions = [positions[3 * i:3 * i + 3] for i in range(self.N)]
+            self.solve_ids(self.pending, step, positions)
+        return positions
+
+    def solve_ids(self, ids, step: int, pos: list):
+        """ solve vertices `ids` in order into `pos`, a list of [x, y, z] in python floats (faster to solve with than
+        numpy scalars), each rounded like `solve_vertices` keeps it so that later vertices read the same values,
+        unless a compiled solver (which solves in f64 and is rounded once on upload) is running
+        """
+        rounded = self.precision == ti.f32 and self.solver is None
+        for i in ids:
+            self.solve_vertex(i, step, pos, self.kinematics)
+            if rounded:
+                pos[i] = np.array(pos[i], dtype=np.float32).tolist()
+
+    def enable_kinematics(self):
+        """ also solve velocity and acceleration of every vertex with respect to the driver angle
+
+        Derivatives are propagated along the graph in the same pass as positions, see `get_velocities` and
+        `get_accelerations`.
+        """
+        self.kinematics = np.zeros((self.N, 4), dtype=np.float64)  # vx, vy, ax, ay
+        self.velocities = ti.Vector.field(2, dtype=ti.f32, shape=self.N)
+        self.accelerations = ti.Vector.field(2, dtype=ti.f32, shape=self.N)
+        if self.solver is not None:
+            self.compile()
+
+    def sync_kinematics(self):
+        self.velocities.from_numpy(self.kinematics[:, :2].astype(np.float32))
+        self.accelerations.from_numpy(self.kinematics[:, 2:].astype(np.float32))
+
+    def compile(self):
+        """ solve with a function generated for this linkage instead of `solve_vertex`, see `codegen` """
+        from .codegen import compile_solver
+        self.compiled = True
+        self.solver = compile_solver(self, self.kinematics is not None)
+        self.pending = []
+
+    def numpy_dtype(self):
+        return np.float64 if self.precision == ti.f64 else np.float32
+
+    def sync_vertices(self):
+        if self.solve_vertices is not self.vertices:
+            copy_vertices(self.solve_vertices, self.vertices)
+        if self.kinematics is not None:
+            self.sync_kinematics()
+
+    def solve_vertex(self, i: int, step: int, pos, kin=None):
+        """ solve position of vertex `i` at `step`
+
+        :param pos: position storage indexed by vertex id, e.g. `self.solve_vertices` or a row of the cycle cache,
+            vertices that `i` relies on must already be solved in it
+        :param kin: optional (N, 4) array of [vx, vy, ax, ay] with respect to the driver angle, filled like `pos`
+        """
+        info = self.vertex_infos[i]
+        if info.tp == VertexType.Fixed:
+            pos[i] = [info.param[0], info.param[1], 0]
+            if kin is not None:
+                kin[i] = 0
+        elif info.tp == VertexType.Driver:
+            cycle = info.param[4] - info.param[3]
+            # theta = step * 0.01 % cycle + info.param[3]  # cycle
+            theta = cycle - abs(cycle - step * 0.01 % (cycle * 2)) + info.param[3]  # wander
+            dx, dy = info.param[2] * math.cos(theta), info.param[2] * math.sin(theta)
+            pos[i] = [info.param[0] + dx, info.param[1] + dy, 0]
+            if kin is not None:
+                kin[i] = [-dy, dx, -dx, -dy]
+        elif info.tp == VertexType.Driven:
+            id1, r1, id2, r2, hint = info.param[:5]
+            x1, y1 = pos[id1][0], pos[id1][1]
+            x2, y2 = pos[id2][0], pos[id2][1]
+            x3, y3 = intersect_of_circle(x1, y1, r1, x2, y2, r2)[hint]
+            # if i == 5:
+            #     print(x3)  # 0.6799779794256628, 5.320021789745519
+
+            if len(info.param) == 6:  # if it can't form a Parallelogram, use the other intersection
+                anti_hint = info.param[5]
+                x0, y0 = pos[anti_hint][0], pos[anti_hint][1]
+
+                x3d, y3d = intersect_of_circle(x1, y1, r1, x2, y2, r2)[1 - hint]
+                diff1 = abs((y1 - y0) * (x3 - x2) - (y3 - y2) * (x1 - x0))
+                diffd = abs((y1 - y0) * (x3d - x2) - (y3d - y2) * (x1 - x0))
+                if diffd + 1e-3 < diff1:
+                    x3, y3 = x3d, y3d
+                    info.param[4] = 1 - info.param[4]
+            pos[i] = [x3, y3, 0]
+            if kin is not None:
+                kin[i] = derivatives_of_intersection(x3, y3, x1, y1, *kin[id1], x2, y2, *kin[id2])
+
+    def get_parents(self, i: int) -> List[int]:
+        info = self.vertex_infos[i]
+        if info.tp != VertexType.Driven:
+            return []
+        return [info.param[0], info.param[2]] + info.param[5:6]
+
+    def get_dependents(self, i: int) -> List[int]:
+        """ return `i` and all vertices that rely on it (directly or not), in solving order """
+        dirty = [False] * self.N
+        dirty[i] = True
+        # small-id vertex never relies on large-id vertex, so one forward sweep is enough
+        for j in range(i + 1, self.N):
+            dirty[j] = any(dirty[p] for p in self.get_parents(j))
+        return [j for j in range(i, self.N) if dirty[j]]
+
+    def cache_cycle(self, steps: int):
+        """ solve and keep positions of all vertices for step 0 .. steps-1, see `get_cycle` """
+        self.cycle = np.zeros((steps, self.N, 3), dtype=np.float64)
+        for step in range(steps):
+            for i in range(self.N):
+                self.solve_vertex(i, step, self.cycle[step])
+
+    def get_cycle(self):
+        return self.cycle
+
+    def set_vertex_param(self, i: int, param: List[float]) -> List[int]:
+        """ edit params of one vertex and re-solve only the vertices relying on it
+
+        upstream vertices are left untouched, both for the current step and for the cached cycle (if any).
+        Parents of a Driven vertex may change too, its two bars are moved to the new parents.
+        A compiled linkage keeps running its last solver while it is edited, with the re-solved vertices solved over
+        its positions by `solve_vertex`, and is compiled again once `Linkage.recompile_after` substeps passed without
+        edits, instead of generating a solver per edit.
+
+        :param i: vertex id, its type is kept
+        :param param: new params, same layout as `VertexInfo`
+        :return: ids of re-solved vertices
+
+        Example::
+            linkage.set_vertex_param(0, [3.0, -7.0])  # move a Fixed vertex
+        """
+        info = self.vertex_infos[i]
+        VertexInfo(info.tp, param)  # validate
+        if info.tp == VertexType.Driven:
+            assert all(p < i for p in param[0:3:2] + param[5:6])
+        info.param = list(param)
+        if info.tp == VertexType.Driven:
+            self.line_indices[self.bar_index[i]] = [i, param[0]]
+            self.line_indices[self.bar_index[i] + 1] = [i, param[2]]
+            self.barsVersion += 1
+        dirty = self.get_dependents(i)
+        if self.compiled:
+            self.pending = sorted(set(self.pending).union(dirty))
+            self.stableSteps = 0
+        if self.cycle is not None:
+            for step in range(len(self.cycle)):
+                for j in dirty:
+                    self.solve_vertex(j, step, self.cycle[step])
+        # one upload instead of a field access per coordinate
+        pos = (self.solve_vertices.to_numpy() if self.solved is None else self.solved).tolist()
+        self.solve_ids(dirty, self.step, pos)
+        self.solved = np.array(pos, dtype=np.float64)
+        self.solve_vertices.from_numpy(self.solved.astype(self.numpy_dtype()))
+        self.sync_vertices()
+        return dirty
 
     def get_vertices(self):
         return self.vertices
 
+    def get_velocities(self):
+        return self.velocities
+
+    def get_accelerations(self):
+        return self.accelerations
+
     def get_indices(self):
         return self.line_indices
 
+    def get_bars_version(self):
+        return self.barsVersion
+
     def get_colors(self):
         return self.colors if hasattr(self, 'colors') else None
 
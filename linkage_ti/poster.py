@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+import taichi as ti
+
+from . import ui
+from .linkage import Linkage
+
+# downsampled tiles, keyed by supersample factor
+tiles = {}
+
+
+@ti.kernel
+def downsample(tile: ti.template(), factor: ti.i32):
+    for x, y in tile:
+        rgb = ti.math.vec3(0, 0, 0)
+        for i, j in ti.ndrange(factor, factor):
+            rgb += ui.pixels[x * factor + i, y * factor + j]
+        tile[x, y] = rgb / (factor * factor)
+
+
+def get_tile(factor: int):
+    if factor not in tiles:
+        size = ui.windowSize // factor
+        tiles[factor] = ti.Vector.field(3, dtype=ti.f32, shape=(size, size))
+    return tiles[factor]
+
+
+def render_poster(linkage: Linkage, path: str, width: int, height: int, zoom: float = 20, x: float = 10,
+                  y: float = 15, supersample: int = 2, step: int = 0, trackedSize: float = 0.7, colors=None,
+                  strokeScale: float = None):
+    """ render linkage and its trails into a binary PPM image of any size
+
+    The image is painted tile by tile by the same kernels as `ui.show`, each tile is painted into `ui.pixels`
+    at `supersample` times resolution, averaged down and written to its place in the file, so memory use does
+    not grow with the image size.
+
+    :param zoom, x, y: view transform as in `ui.show`, in output pixels, i.e. a 768x768 poster with default
+        params looks like the window
+    :param supersample: samples per output pixel along each axis, must divide `ui.windowSize`, strokes are
+        painted `supersample` times as wide so that it only smooths their edges
+    :param strokeScale: width of strokes relative to the window (default: `width / ui.windowSize`), so that a
+        poster zoomed in with its size looks like an enlarged window
+    :param step: step of the drawn pose, trails always cover the first 120 steps
+    :param colors: per-vertex colors, see `ui.paint_frame`
+
+    Example::
+        render_poster(cases.taichi(), "taichi.ppm", 16384, 16384, zoom=20 * 16 / 0.75, x=10, y=15)
+    """
+    assert ui.windowSize % supersample == 0
+    tile = get_tile(supersample)
+    tileSize = tile.shape[0]
+
+    trackedPoints = ui.create_tracked_points(linkage)
+    for s in range(120):
+        linkage.substep(s)
+        ui.get_tracked_points(linkage.get_vertices(), linkage.get_istracked(), trackedPoints, s)
+    linkage.substep(step)
+
+    driverColor = ti.math.vec3(ti.hex_to_rgb(0xd88c9a))
+    trackColor = ti.math.vec3(ti.hex_to_rgb(0x38a3a5))
+    lineColor = ti.math.vec3(ti.hex_to_rgb(0x22577a))
+    cursor = ti.math.vec2(-1e6, -1e6)  # no hover feedback
+    sampleZoom = zoom * supersample
+    if strokeScale is None:
+        strokeScale = width / ui.windowSize
+
+    header = b"P6\n%d %d\n255\n" % (width, height)
+    with open(path, "wb") as f:
+        f.write(header)
+        f.truncate(len(header) + width * height * 3)
+
+        for ty in range(math.ceil(height / tileSize)):
+            for tx in range(math.ceil(width / tileSize)):
+                # shift the view so that this tile lands on `ui.pixels`
+                tileX = x - tx * ui.windowSize / sampleZoom
+                tileY = y - ty * ui.windowSize / sampleZoom
+                ui.paint_frame(linkage, step, trackedPoints, cursor, 0, 0, driverColor, trackColor, lineColor,
+                               trackedSize, sampleZoom, tileX, tileY, colors, strokeScale * supersample)
+                downsample(tile, supersample)
+
+                w = min(tileSize, width - tx * tileSize)
+                h = min(tileSize, height - ty * tileSize)
+                rgb = (np.clip(tile.to_numpy()[:w, :h], 0, 1) * 255).astype(np.uint8)
+                for j in range(h):
+                    # ppm rows go from top to bottom, while pixels[x, 0] is the bottom
+                    row = height - 1 - (ty * tileSize + j)
+                    f.seek(len(header) + (row * width + tx * tileSize) * 3)
+                    f.write(rgb[:, j].tobytes())
@@ -0,0 +1,136 @@
+from typing import List, Tuple
+
+import numpy as np
+import taichi as ti
+
+from .linkage import Linkage
+
+
+@ti.kernel
+def apply_transforms(local: ti.template(), owner: ti.template(), transforms: ti.template(),
+                     vertices: ti.template()):
+    for i in local:
+        t = transforms[owner[i]]
+        vertices[i] = ti.math.vec3(local[i].xy * t.z + t.xy, 0)
+
+
+class Scene:
+    def __init__(self, linkages: List[Linkage], offsets: List[Tuple[float, float]] = None, scales: List[float] = None,
+                 colors: List[Tuple[float, float, float]] = None):
+        """ pack several linkages into shared fields, so they are solved and painted by one set of compiled kernels
+
+        A scene has the same getters as `Linkage`, so it can be passed to `ui.show` as is. Every linkage is solved by
+        `Linkage.solve` (in its own precision, compiled or not) into one numpy array, uploaded once per substep.
+
+        :param offsets: world offset of each linkage, applied after scaling
+        :param scales: scale of each linkage
+        :param colors: color of each linkage, used for its vertices without a color of their own
+
+        Example::
+            ui.show(Scene([cases.Axes(), cases.Zoomer()], [(0, 0), (12, 0)]), vertexColors=True)
+        """
+        self.linkages = linkages
+        self.M = len(linkages)
+        offsets = offsets or [(0.0, 0.0)] * self.M
+        scales = scales or [1.0] * self.M
+        colors = colors or [(0.28, 0.68, 0.99)] * self.M
+
+        self.starts: List[int] = []
+        self.N = 0
+        for linkage in linkages:
+            self.starts.append(self.N)
+            self.N += linkage.N
+        self.scales = np.repeat(scales, [linkage.N for linkage in linkages])[:, None]  # of every vertex
+        self.kinematics = None
+
+        self.staging = np.zeros((self.N, 3), dtype=np.float64)
+        self.local = ti.Vector.field(3, dtype=ti.f32, shape=self.N)
+        self.vertices = ti.Vector.field(3, dtype=ti.f32, shape=self.N)
+        self.owner = ti.field(dtype=ti.i32, shape=self.N)
+        self.transforms = ti.Vector.field(3, dtype=ti.f32, shape=self.M)
+        self.colors = ti.Vector.field(3, dtype=ti.f32, shape=self.N)
+        self.tracked = ti.Vector.field(1, dtype=ti.u8, shape=self.N)
+        self.trackedNum = 0
+
+        for k, linkage in enumerate(linkages):
+            start = self.starts[k]
+            self.transforms[k] = [offsets[k][0], offsets[k][1], scales[k]]
+
+            own_colors = linkage.get_colors()
+            tracked = linkage.get_istracked().to_numpy()
+            for i in range(linkage.N):
+                self.owner[start + i] = k
+                hasOwn = own_colors is not None and i < own_colors.shape[0]
+                self.colors[start + i] = own_colors[i] if hasOwn else colors[k]
+                if tracked[i][0] != 0:
+                    self.tracked[start + i][0] = 1
+                    self.trackedNum += 1
+
+        lines = self.pack_lines()
+        self.line_indices = ti.Vector.field(2, dtype=ti.i32, shape=len(lines))
+        self.line_indices.from_numpy(lines)
+        self.barsVersion = 0
+        self.barsSeen = [linkage.get_bars_version() for linkage in linkages]
+
+    def pack_lines(self):
+        return np.concatenate([linkage.get_indices().to_numpy() + start
+                               for linkage, start in zip(self.linkages, self.starts)]).astype(np.int32)
+
+    def refresh_lines(self):
+        # bars of a linkage move when an edit changes the parents of a Driven vertex
+        seen = [linkage.get_bars_version() for linkage in self.linkages]
+        if seen != self.barsSeen:
+            self.line_indices.from_numpy(self.pack_lines())
+            self.barsSeen = seen
+            self.barsVersion += 1
+
+    def substep(self, step: int):
+        for k, linkage in enumerate(self.linkages):
+            self.staging[self.starts[k]:self.starts[k] + linkage.N] = linkage.solve(step)
+        self.local.from_numpy(self.staging.astype(np.float32))
+        apply_transforms(self.local, self.owner, self.transforms, self.vertices)
+        if self.kinematics is not None:
+            self.kinematics[:] = np.concatenate([linkage.kinematics for linkage in self.linkages]) * self.scales
+            self.velocities.from_numpy(self.kinematics[:, :2].astype(np.float32))
+            self.accelerations.from_numpy(self.kinematics[:, 2:].astype(np.float32))
+
+    def enable_kinematics(self):
+        """ solve velocity and acceleration of every vertex, see `Linkage.enable_kinematics`
+
+        Each linkage is differentiated with respect to its own driver angle, in scene units (scaled by its scale).
+        """
+        for linkage in self.linkages:
+            linkage.enable_kinematics()
+        self.kinematics = np.zeros((self.N, 4), dtype=np.float64)
+        self.velocities = ti.Vector.field(2, dtype=ti.f32, shape=self.N)
+        self.accelerations = ti.Vector.field(2, dtype=ti.f32, shape=self.N)
+
+    def get_vertices(self):
+        return self.vertices
+
+    def get_velocities(self):
+        return self.velocities
+
+    def get_accelerations(self):
+        return self.accelerations
+
+    def get_indices(self):
+        self.refresh_lines()
+        return self.line_indices
+
+    def get_bars_version(self):
+        self.refresh_lines()
+        return self.barsVersion
+
+    def get_colors(self):
+        return self.colors
+
+    def get_istracked(self):
+        return self.tracked
+
+    def get_trackedNum(self):
+        return self.trackedNum
+
+    def get_driver(self):
+        # every linkage has its own driver, none is highlighted
+        return -1
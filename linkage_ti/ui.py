@@ -1,3 +1,6 @@
+import time
+
+import numpy as np
 import taichi as ti
 
 # from linkage import Linkage
@@ -6,8 +9,6 @@ from .linkage import Linkage
 windowSize = 768
 strong = windowSize * 0.001
 
-ti.init(arch=ti.cpu)
-
 driverColor = ti.math.vec3(ti.hex_to_rgb(0xd88c9a))
 trackColor = ti.math.vec3(ti.hex_to_rgb(0x99c1b9))
 
@@ -19,57 +20,110 @@ green = ti.math.vec3(ti.hex_to_rgb(0x81B29A))
 blue = ti.math.vec3(ti.hex_to_rgb(0x4f5d75))
 yellow = ti.math.vec3(ti.hex_to_rgb(0xef8354))
 
-trackList = ti.Vector.field(2, dtype=ti.f32, shape=1000)
-pixels = ti.Vector.field(3, dtype=ti.f32, shape=(windowSize, windowSize))
+# fields are allocated by `init`
+trackList = None
+pixels = None
+# painting is limited to [x0, x1) * [y0, y1) of `pixels`
+clip = None
+topSpeed = None
+# pixels around the cursor that hover feedback can reach: points within `zone` grow, and paint `zone` around them
+cursorReach = 2 * 30 + 2
+# pixels around a vertex, bar end or trail point that it paints into, `zone` of `paint_point` and rounding
+paintReach = 30 + 2
+
+
+def init(arch=ti.cpu, **options):
+    """ init taichi and allocate the fields ui paints into, call it before building any linkage
+
+    :param options: passed to `ti.init`, e.g. cpu_max_num_threads
 
+    Example::
+        ui.init(arch=ti.cuda)
+        ui.show(cases.taichi())
+    """
+    global trackList, pixels, clip, topSpeed
+    ti.init(arch=arch, **options)
+    trackList = ti.Vector.field(2, dtype=ti.f32, shape=1000)
+    pixels = ti.Vector.field(3, dtype=ti.f32, shape=(windowSize, windowSize))
+    clip = ti.Vector.field(4, dtype=ti.i32, shape=())
+    clip[None] = [0, 0, windowSize, windowSize]
+    topSpeed = ti.field(dtype=ti.f32, shape=())
 
+
+def create_tracked_points(linkage: Linkage):
+    """ field of the last 120 positions of every tracked vertex, filled by `get_tracked_points`
+
+    Fields can't be empty, without tracked vertices it has one row that stays (0, 0) and is never painted.
+    """
+    return ti.Vector.field(2, dtype=ti.f32, shape=(max(linkage.get_trackedNum(), 1), 120))
+
+
+# `scale` is the size of a window pixel in `pixels`, e.g. 2 when painting at twice the resolution for a poster
 @ti.func
-def paint_line_point(pos: ti.math.vec2, radius: ti.f32, strength: ti.f32, color: ti.math.vec3):
-    for x in range(int(ti.math.floor(pos.x - radius)), int(ti.math.ceil(pos.x + radius))):
-        for y in range(int(ti.math.floor(pos.y - radius)), int(ti.math.ceil(pos.y + radius))):
+def paint_line_point(pos: ti.math.vec2, radius: ti.f32, strength: ti.f32, color: ti.math.vec3, scale: ti.f32):
+    reach = (radius + 0.5) * scale - 0.5  # pixels reached at scale 1 round out to whole pixels
+    for x in range(ti.max(int(ti.math.floor(pos.x - reach)), clip[None][0]),
+                   ti.min(int(ti.math.ceil(pos.x + reach)), clip[None][2])):
+        for y in range(ti.max(int(ti.math.floor(pos.y - reach)), clip[None][1]),
+                       ti.min(int(ti.math.ceil(pos.y + reach)), clip[None][3])):
             pixel = ti.math.vec2(x, y)
             dist = ti.math.distance(pixel, pos)
 
-            rgb = (1 - ti.math.pow(radius - 0.001, dist / strong) * (strength * 6) * color)
+            rgb = (1 - ti.math.pow(radius - 0.001, dist / (strong * scale)) * (strength * 6) * color)
             pixels[x, y] = white - (white - pixels[x, y]) * rgb
 
 
 @ti.func
 def paint_point(pos: ti.math.vec2, size: ti.f32, cursor: ti.math.vec2, zone: ti.f32, strength: ti.f32,
-                color: ti.math.vec3, notTrack: ti.u8):
+                color: ti.math.vec3, notTrack: ti.u8, scale: ti.f32):
     radius = size
+    zone *= scale
     distCursor = ti.math.distance(cursor, pos)
     if (distCursor <= zone and notTrack != 0):
         radius += (1 - distCursor / zone) * (0.9 - radius)
         strength *= 2
 
-    for x in range(int(ti.math.floor(pos.x - zone)), int(ti.math.ceil(pos.x + zone))):
-        for y in range(int(ti.math.floor(pos.y - zone)), int(ti.math.ceil(pos.y + zone))):
+    for x in range(ti.max(int(ti.math.floor(pos.x - zone)), clip[None][0]),
+                   ti.min(int(ti.math.ceil(pos.x + zone)), clip[None][2])):
+        for y in range(ti.max(int(ti.math.floor(pos.y - zone)), clip[None][1]),
+                       ti.min(int(ti.math.ceil(pos.y + zone)), clip[None][3])):
             pixel = ti.math.vec2(x, y)
             dist = ti.math.distance(pixel, pos)
 
-            rgb = (1 - ti.math.pow(radius - 0.001, dist / strong) * (strength * 2) * color)
+            rgb = (1 - ti.math.pow(radius - 0.001, dist / (strong * scale)) * (strength * 2) * color)
             pixels[x, y] = white - (white - pixels[x, y]) * rgb
 
 
 @ti.kernel
-def create_points(vertices: ti.template(), cursor: ti.math.vec2, tracked: ti.template(), driver: ti.i32,
-                  driverColor: ti.math.vec3, trackColor: ti.math.vec3, lineColor: ti.math.vec3, trackedSize: ti.f32,
+def create_points(vertices: ti.template(), colors: ti.template(), cursor: ti.math.vec2, tracked: ti.template(),
+                  driver: ti.i32, driverColor: ti.math.vec3, trackColor: ti.math.vec3, trackedSize: ti.f32,
                   zoom: ti.f32, x: ti.f32,
-                  y: ti.f32):
+                  y: ti.f32, scale: ti.f32):
     for n in range(vertices.shape[0]):
         pos = trans_pos(vertices[n].xy, zoom, x, y)
         if (n == driver):
-            paint_point(pos=pos, size=trackedSize, cursor=cursor, zone=30., strength=.8, color=driverColor, notTrack=1)
+            paint_point(pos=pos, size=trackedSize, cursor=cursor, zone=30., strength=.8,
+                        color=driverColor, notTrack=1, scale=scale)
         if (tracked[n][0] != 0):
-            paint_point(pos=pos, size=trackedSize, cursor=cursor, zone=30., strength=1., color=trackColor, notTrack=0)
+            paint_point(pos=pos, size=trackedSize, cursor=cursor, zone=30., strength=1.,
+                        color=trackColor, notTrack=0, scale=scale)
         else:
-            paint_point(pos=pos, size=0.4, cursor=cursor, zone=30., strength=.6, color=lineColor, notTrack=1)
+            paint_point(pos=pos, size=0.4, cursor=cursor, zone=30., strength=.6,
+                        color=colors[n], notTrack=1, scale=scale)
+
+
+@ti.kernel
+def speed_colors(velocities: ti.template(), colors: ti.template(), slow: ti.math.vec3, fast: ti.math.vec3):
+    topSpeed[None] = 1e-6
+    for i in velocities:
+        ti.atomic_max(topSpeed[None], velocities[i].norm())
+    for i in velocities:
+        colors[i] = ti.math.mix(slow, fast, velocities[i].norm() / topSpeed[None])
 
 
 @ti.kernel
 def paint_bg(color: ti.math.vec3, isPreview: ti.u8):
-    for x, y in pixels:
+    for x, y in ti.ndrange((clip[None][0], clip[None][2]), (clip[None][1], clip[None][3])):
         rgb = color
         if (isPreview != 0):
             pixels[x, y] -= 0.03 - pixels[x, y] * 0.01
@@ -87,15 +141,15 @@ def trans_pos(pos: ti.math.vec2, zoom: ti.f32, x: ti.f32, y: ti.f32) -> ti.math.
 
 
 @ti.kernel
-def paint_line(vertices: ti.template(), indices: ti.template(), color: ti.math.vec3, strength: ti.f32, zoom: ti.f32,
+def paint_line(vertices: ti.template(), indices: ti.template(), colors: ti.template(), strength: ti.f32, zoom: ti.f32,
                x: ti.f32,
-               y: ti.f32):
+               y: ti.f32, scale: ti.f32):
     for i in range(indices.shape[0]):
         pointA = trans_pos(vertices[indices[i][0]].xy, zoom, x, y)
         pointB = trans_pos(vertices[indices[i][1]].xy, zoom, x, y)
         n = ti.math.distance(pointB, pointA)
         # n = (abs(pointB[0] - pointA[0]) + abs(pointB[1] - pointA[1]))
-        n = ti.math.floor(n) + 1
+        n = ti.math.floor(n / scale) + 1
         width = 0.5
         unitX = (pointB[0] - pointA[0]) / n
         unitY = (pointB[1] - pointA[1]) / n
@@ -104,14 +158,15 @@ def paint_line(vertices: ti.template(), indices: ti.template(), color: ti.math.v
             posX = pointA[0] + unitX * j
             posY = pointA[1] + unitY * j
             # paint_point(ti.math.vec2(posX, posY), width, cursor, 30, strength, color, 0)
-            paint_line_point(ti.math.vec2(posX, posY), radius=width, strength=strength, color=color)
+            paint_line_point(ti.math.vec2(posX, posY), radius=width, strength=strength, color=colors[indices[i][0]],
+                             scale=scale)
             # paint_line_point(pos=(posX, posY), radius=width, strength=strength)
 
 
 @ti.kernel
 def paint_track(step: ti.i32, trackedPoints: ti.template(), cursor: ti.math.vec2, color: ti.math.vec3,
                 trackedSize: ti.f32, zoom: ti.f32,
-                x: ti.f32, y: ti.f32):
+                x: ti.f32, y: ti.f32, scale: ti.f32):
     for n in ti.grouped(trackedPoints):
         pos = trans_pos(trackedPoints[n], zoom, x, y)
         now = step % 240
@@ -121,7 +176,8 @@ def paint_track(step: ti.i32, trackedPoints: ti.template(), cursor: ti.math.vec2
         strength = (1 - dist + 0.1) * 0.9
 
         if all(trackedPoints[n] != [0, 0]):
-            paint_point(pos=pos, size=size, cursor=cursor, zone=30., strength=strength, color=color, notTrack=1)
+            paint_point(pos=pos, size=size, cursor=cursor, zone=30., strength=strength,
+                        color=color, notTrack=1, scale=scale)
 
 
 @ti.kernel
@@ -133,7 +189,179 @@ def get_tracked_points(vertices: ti.template(), isTracked: ti.template(), tracke
             i += 1
 
 
-def show(linkage: Linkage):
+# color fields of one color, keyed by size and color, so that kernels taking a colors field don't recompile per frame
+uniforms = {}
+
+
+def uniform_colors(n: int, color: ti.math.vec3):
+    key = (n, tuple(float(c) for c in color))
+    if key not in uniforms:
+        uniforms[key] = ti.Vector.field(3, dtype=ti.f32, shape=n)
+        uniforms[key].fill(color)
+    return uniforms[key]
+
+
+def paint_frame(linkage: Linkage, steps: int, trackedPoints, cursor: ti.math.vec2, isPreview: int, isPressing: int,
+                driverColor: ti.math.vec3, trackColor: ti.math.vec3, lineColor: ti.math.vec3, trackedSize: float,
+                zoom: float, x: float, y: float, colors=None, scale: float = 1.0):
+    """ paint one frame into `pixels`
+
+    :param colors: per-vertex colors used instead of `lineColor`, e.g. `linkage.get_colors()`
+    :param scale: size of a window pixel in `pixels`, strokes, glow and hover zone grow with it
+    """
+    vertices = linkage.get_vertices()
+    indices = linkage.get_indices()
+    isTracked = linkage.get_istracked()
+    driver = linkage.get_driver()
+
+    if colors is None:
+        colors = uniform_colors(vertices.shape[0], lineColor)
+
+    def points():
+        create_points(vertices, colors, cursor, isTracked, driver, driverColor, trackColor, trackedSize, zoom, x, y,
+                      scale)
+
+    def lines():
+        paint_line(vertices, indices, colors, trackedSize / 2, zoom, x, y, scale)
+
+    paint_bg(black, isPreview)
+    points()
+    paint_track(steps, trackedPoints, cursor, trackColor, trackedSize, zoom, x, y, scale)
+
+    # paint_track(vertices, isTracked)
+    if (isPreview != 1):
+        lines()
+
+    if (isPressing == 1):
+        paint_bg(black, isPreview)
+        points()
+        lines()
+        paint_track(steps, trackedPoints, cursor, trackColor, trackedSize, zoom, x, y, scale)
+
+
+@ti.kernel
+def ggui_vertices(vertices: ti.template(), tracked: ti.template(), colors: ti.template(), driver: ti.i32,
+                  driverColor: ti.math.vec3, trackColor: ti.math.vec3, screen: ti.template(),
+                  screenColors: ti.template(), zoom: ti.f32, x: ti.f32, y: ti.f32):
+    for n in vertices:
+        screen[n] = trans_pos(vertices[n].xy, zoom, x, y) / windowSize
+        screenColors[n] = colors[n]
+        if (tracked[n][0] != 0):
+            screenColors[n] = trackColor
+        if (n == driver):
+            screenColors[n] = driverColor
+
+
+@ti.kernel
+def ggui_trails(trackedPoints: ti.template(), trails: ti.template(), zoom: ti.f32, x: ti.f32, y: ti.f32):
+    for i, j in trackedPoints:
+        pos = ti.math.vec2(-1, -1)  # off screen, not traced yet
+        if all(trackedPoints[i, j] != [0, 0]):
+            pos = trans_pos(trackedPoints[i, j], zoom, x, y) / windowSize
+        trails[i * trackedPoints.shape[1] + j] = pos
+
+
+class GguiRenderer:
+    """draw a linkage with GGUI's `canvas.lines` / `canvas.circles` instead of painting into `pixels`
+
+    It has no hover feedback, trail pulse or preview (trail accumulation) mode, `show` uses `paint_frame` for those.
+    """
+
+    def __init__(self, linkage: Linkage, trackedPoints, lineColor: ti.math.vec3, colors=None):
+        self.linkage = linkage
+        self.trackedPoints = trackedPoints
+        N = linkage.get_vertices().shape[0]
+        self.colors = colors if colors is not None else uniform_colors(N, lineColor)
+        self.screen = ti.Vector.field(2, dtype=ti.f32, shape=N)
+        self.screenColors = ti.Vector.field(3, dtype=ti.f32, shape=N)
+
+        # GGUI takes indices of lines as a flat int field
+        self.indices = ti.field(dtype=ti.i32, shape=linkage.get_indices().shape[0] * 2)
+        self.barsVersion = None
+
+        self.trails = None  # nothing tracked, `create_tracked_points` only has a spare row
+        if linkage.get_trackedNum() > 0:
+            self.trails = ti.Vector.field(2, dtype=ti.f32, shape=trackedPoints.shape[0] * trackedPoints.shape[1])
+
+    def draw(self, canvas, driverColor, trackColor: ti.math.vec3, trackedSize: float, zoom: float, x: float,
+             y: float):
+        linkage = self.linkage
+        if linkage.get_bars_version() != self.barsVersion:  # an edit moved bars
+            self.indices.from_numpy(linkage.get_indices().to_numpy().reshape(-1).astype(np.int32))
+            self.barsVersion = linkage.get_bars_version()
+        ggui_vertices(linkage.get_vertices(), linkage.get_istracked(), self.colors, linkage.get_driver(), driverColor,
+                      trackColor, self.screen, self.screenColors, zoom, x, y)
+
+        canvas.set_background_color(tuple(float(c) for c in black.to_numpy()))
+        canvas.lines(self.screen, width=trackedSize * 0.003, indices=self.indices, per_vertex_color=self.screenColors)
+        canvas.circles(self.screen, radius=trackedSize * 0.006, per_vertex_color=self.screenColors)
+        if self.trails is not None:
+            ggui_trails(self.trackedPoints, self.trails, zoom, x, y)
+            canvas.circles(self.trails, radius=trackedSize * 0.003, color=tuple(float(c) for c in trackColor.to_numpy()))
+
+
+def screen_box(points: np.ndarray, zoom: float, x: float, y: float):
+    """ clip rectangle [x0, y0, x1, y1) of everything painted around `points` of shape (n, 2), None if offscreen """
+    if len(points) == 0:
+        return None
+    pos = (points + (x, y)) * zoom
+    low = np.floor(pos.min(axis=0)).astype(int) - paintReach
+    high = np.ceil(pos.max(axis=0)).astype(int) + paintReach
+    box = [max(low[0], 0), max(low[1], 0), min(high[0], windowSize), min(high[1], windowSize)]
+    return box if box[0] < box[2] and box[1] < box[3] else None
+
+
+def moved_box(lastPos: np.ndarray, pos: np.ndarray, indices: np.ndarray, changed: np.ndarray, zoom: float,
+              x: float, y: float):
+    """ clip rectangle around old and new positions of `changed` vertices and of both ends of their bars """
+    ids = np.flatnonzero(changed)
+    bars = indices[np.isin(indices, ids).any(axis=1)]
+    ends = np.union1d(ids, bars.reshape(-1))
+    return screen_box(np.concatenate([lastPos[ends], pos[ends]]), zoom, x, y)
+
+
+def trail_box(trackedPoints, zoom: float, x: float, y: float):
+    points = trackedPoints.to_numpy().reshape(-1, 2)
+    # `paint_track` skips points that are not traced yet
+    return screen_box(points[np.all(points != 0, axis=1)], zoom, x, y)
+
+
+def merge_boxes(boxes):
+    """ merge boxes that overlap enough that painting their union costs no more than painting both """
+    def area(box):
+        return (box[2] - box[0]) * (box[3] - box[1])
+
+    boxes = [box for box in boxes if box is not None]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                union = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                if area(union) <= area(a) + area(b):
+                    boxes[i] = union
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+
+def show(linkage: Linkage, vertexColors: bool = False, velocityColors: bool = False, backend: str = "software"):
+    """ show linkage (or a `Scene`) in a window
+
+    A frame is only painted when something changed. View or toggle changes repaint the whole frame, otherwise only
+    rectangles around moved (or recolored) vertices and their bars, the pulsing trails and the old and new cursor are
+    repainted. Frames/s, steps/s, frame counts and cpu time saved are printed on close.
+
+    :param vertexColors: paint untracked vertices and bars with `linkage.get_colors()`
+    :param velocityColors: paint untracked vertices and bars from slow (blue) to fast (yellow), relative to the
+        fastest vertex, see `Linkage.enable_kinematics`
+    :param backend: "software" paints into `pixels`, "ggui" draws with `GguiRenderer` and falls back to software in
+        preview mode
+    """
     isPreview = 0
     isPressing = 0
 
@@ -151,10 +379,37 @@ def show(linkage: Linkage):
     driverColor = ti.math.vec3(ti.hex_to_rgb(0xd88c9a))
     trackColor = ti.math.vec3(ti.hex_to_rgb(0x38a3a5))
     lineColor = ti.math.vec3(ti.hex_to_rgb(0x22577a))
-    trackedPoints = ti.Vector.field(2, dtype=ti.f32, shape=(linkage.get_trackedNum(), 120))
+    trackedPoints = create_tracked_points(linkage)
+
+    colors = linkage.get_colors() if vertexColors else None
+    if velocityColors:
+        linkage.enable_kinematics()
+        colors = ti.Vector.field(3, dtype=ti.f32, shape=linkage.N)
+    renderer = GguiRenderer(linkage, trackedPoints, lineColor, colors) if backend == "ggui" else None
+    solvedStep = -1
+    trackedStep = -1
+    indices, barsVersion = None, None
+    pos, posColors = None, None  # of the solved step, fetched once per solve
+    lastPos, lastColors, lastStep, lastView = None, None, -1, None  # of the last painted frame
+    trails = None
+    lastCursor = (0.0, 0.0)
+    fullFrames, partialFrames, skippedFrames = 0, 0, 0
+    fullTime, partialTime, pushTime = 0.0, 0.0, 0.0
+    shownFrames, solvedSteps, solving = 0, 0, 0.0
+    start = time.perf_counter()
 
     while window.running:
-        linkage.substep(steps)
+        shownFrames += 1
+        if steps != solvedStep:  # nothing to solve while paused
+            solveStart = time.perf_counter()
+            linkage.substep(steps)
+            solving += time.perf_counter() - solveStart
+            solvedSteps += 1
+            solvedStep = steps
+            if velocityColors:
+                speed_colors(linkage.get_velocities(), colors, lineColor, yellow)
+                posColors = colors.to_numpy()
+            pos = linkage.get_vertices().to_numpy()[:, :2]
         steps += step_diff
 
         if window.get_event(ti.ui.PRESS):
@@ -190,31 +445,87 @@ def show(linkage: Linkage):
         if window.is_pressed('m') and trackedSize > 0.01:
             trackedSize -= 0.01
 
-        vertices = linkage.get_vertices()
-        indices = linkage.get_indices()
-        isTracked = linkage.get_istracked()
-        cursor = ti.math.vec2(window.get_cursor_pos()) * windowSize
+        cursorPos = window.get_cursor_pos()
+        cursorXY = (cursorPos[0] * windowSize, cursorPos[1] * windowSize)
+        cursor = ti.math.vec2(cursorXY)
 
-        if steps < 120:
-            get_tracked_points(vertices, isTracked, trackedPoints, steps)
-
-        paint_bg(black, isPreview)
-        driver = linkage.get_driver()
-
-        create_points(vertices, cursor, isTracked, driver, driverColor, trackColor, lineColor, trackedSize, zoom, x, y)
-        paint_track(steps, trackedPoints, cursor, trackColor, trackedSize, zoom, x, y)
-
-        # paint_track(vertices, isTracked)
-        if (isPreview != 1):
-            paint_line(vertices, indices, lineColor, trackedSize / 2, zoom, x, y)
+        if steps < 120 and steps != trackedStep:
+            get_tracked_points(linkage.get_vertices(), linkage.get_istracked(), trackedPoints, steps)
+            trackedStep = steps
+            trails = None
 
         if (isPressing == 1):
             driverColor = ti.hex_to_rgb(0xfca311)
-            paint_bg(black, isPreview)
-            create_points(vertices, cursor, isTracked, driver, driverColor, trackColor, lineColor, trackedSize, zoom, x,
-                          y)
-            paint_line(vertices, indices, lineColor, trackedSize / 2, zoom, x, y)
-            paint_track(steps, trackedPoints, cursor, trackColor, trackedSize, zoom, x, y)
 
+        if renderer is not None and isPreview == 0:
+            renderer.draw(canvas, driverColor, trackColor, trackedSize, zoom, x, y)
+            lastView = None  # software painting starts over when it takes back
+            window.show()
+            continue
+
+        if linkage.get_bars_version() != barsVersion:  # an edit moved bars, repaint all of them
+            indices = linkage.get_indices().to_numpy()
+            barsVersion = linkage.get_bars_version()
+            lastView = None
+
+        # repaint only what changed since the last painted frame
+        view = (zoom, x, y, trackedSize, isPreview, isPressing)
+        moved = cursorXY != lastCursor
+        frameStart = time.process_time()
+        rects, area = [], 0
+        if view == lastView and isPreview == 0:  # preview fades the whole buffer, it is never repainted partially
+            changed = np.any(pos != lastPos, axis=1)
+            if posColors is not None:
+                changed |= np.any(posColors != lastColors, axis=1)
+            if changed.any():
+                rects.append(moved_box(lastPos, pos, indices, changed, zoom, x, y))
+            if steps != lastStep:  # trails pulse with the step
+                if trails is None:
+                    trails = trail_box(trackedPoints, zoom, x, y)
+                rects.append(trails)
+            if moved:
+                rects.extend([max(int(cx) - cursorReach, 0), max(int(cy) - cursorReach, 0),
+                              min(int(cx) + cursorReach, windowSize), min(int(cy) + cursorReach, windowSize)]
+                             for cx, cy in [lastCursor, cursorXY])
+            rects = merge_boxes(rects)
+            area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects)
+
+        # rectangles repaint every item reaching into them, over half the window a full repaint is cheaper
+        if view != lastView or (isPreview != 0 and (moved or steps != lastStep)) or area * 2 >= windowSize ** 2:
+            paint_frame(linkage, steps, trackedPoints, cursor, isPreview, isPressing, driverColor, trackColor,
+                        lineColor, trackedSize, zoom, x, y, colors)
+            fullFrames += 1
+            fullTime += time.process_time() - frameStart
+        elif rects:
+            for rect in rects:
+                clip[None] = rect
+                paint_frame(linkage, steps, trackedPoints, cursor, isPreview, isPressing, driverColor, trackColor,
+                            lineColor, trackedSize, zoom, x, y, colors)
+            clip[None] = [0, 0, windowSize, windowSize]
+            partialFrames += 1
+            partialTime += time.process_time() - frameStart
+        else:
+            skippedFrames += 1
+            time.sleep(1 / 60)
+        if view != lastView:
+            trails = None  # the view moved them
+        lastPos, lastColors, lastStep, lastView = pos, posColors, steps, view
+        lastCursor = cursorXY
+
+        # the canvas is drawn from scratch every frame, so even a skipped frame pushes the image again
+        pushStart = time.process_time()
         canvas.set_image(pixels)
         window.show()
+        pushTime += time.process_time() - pushStart
+
+    elapsed = time.perf_counter() - start
+    print(f"window: {shownFrames} frames in {elapsed:.3f}s, {shownFrames / elapsed:.1f} frames/s, "
+          f"{solvedSteps / solving if solving > 0 else 0:.1f} steps/s")
+    if fullFrames > 0:
+        frames = fullFrames + partialFrames + skippedFrames
+        fullAvg = fullTime / fullFrames
+        saved = fullAvg * (partialFrames + skippedFrames) - partialTime
+        print(f"frames: {fullFrames} full, {partialFrames} partial, {skippedFrames} skipped, "
+              f"{fullAvg * 1e3:.2f}ms cpu per full frame, {pushTime / frames * 1e3:.2f}ms cpu per image push, "
+              f"{saved / frames * 1e3:.2f}ms cpu saved per frame "
+              f"({saved / (fullTime + partialTime + pushTime + saved) * 100:.0f}% of painting and pushing every frame)")
@@ -1,16 +1,20 @@
 import math
 
 
+class NoIntersectionError(ValueError):
+    """the two circles a Driven vertex lies on don't intersect, the linkage can't be assembled at this step"""
+
+
 def intersect_of_circle(x1, y1, r1, x2, y2, r2):
     d = math.sqrt((abs(x1 - x2)) ** 2 + (abs(y1 - y2)) ** 2)
     if d > (r1 + r2) or d < (abs(r1 - r2)):
-        print("Two circles have no intersection", x1, y1, r1, x2, y2, r2)
-        return
-    elif d == 0 and r1 == r2:
-        print("Two circles have same center!")
-        return
+        raise NoIntersectionError(f"Two circles have no intersection {x1} {y1} {r1} {x2} {y2} {r2}")
+    elif d == 0:
+        raise NoIntersectionError(f"Two circles have same center {x1} {y1}")
 
     A = (r1 ** 2 - r2 ** 2 + d ** 2) / (2 * d)
+    if r1 ** 2 < A ** 2:  # tangent, off by rounding
+        raise NoIntersectionError(f"Two circles have no intersection {x1} {y1} {r1} {x2} {y2} {r2}")
     h = math.sqrt(r1 ** 2 - A ** 2)
 
     a2 = x1 + A * (x2 - x1) / d
@@ -21,3 +25,24 @@ def intersect_of_circle(x1, y1, r1, x2, y2, r2):
     b4 = b2 - h * (x2 - x1) / d
 
     return [a3, b3], [a4, b4]
+
+
+# derivatives of p, an intersection of circle(p1, r1) and circle(p2, r2), given derivatives of p1 and p2
+# from |p - p1|^2 = r1^2: (p - p1) . (v - v1) = 0 and (p - p1) . (a - a1) + |v - v1|^2 = 0, the same for p2
+def derivatives_of_intersection(x, y, x1, y1, vx1, vy1, ax1, ay1, x2, y2, vx2, vy2, ax2, ay2):
+    ux1, uy1 = x - x1, y - y1
+    ux2, uy2 = x - x2, y - y2
+    det = ux1 * uy2 - uy1 * ux2
+    if det == 0:  # circles are tangent, the mechanism is singular here
+        return 0.0, 0.0, 0.0, 0.0
+
+    b1 = ux1 * vx1 + uy1 * vy1
+    b2 = ux2 * vx2 + uy2 * vy2
+    vx = (b1 * uy2 - uy1 * b2) / det
+    vy = (ux1 * b2 - b1 * ux2) / det
+
+    c1 = ux1 * ax1 + uy1 * ay1 - (vx - vx1) ** 2 - (vy - vy1) ** 2
+    c2 = ux2 * ax2 + uy2 * ay2 - (vx - vx2) ** 2 - (vy - vy2) ** 2
+    ax = (c1 * uy2 - uy1 * c2) / det
+    ay = (ux1 * c2 - c1 * ux2) / det
+    return vx, vy, ax, ay
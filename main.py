@@ -1,9 +1,103 @@
-from linkage_ti import ui, cases
+import argparse
+import inspect
+import time
+
+import taichi as ti
+
+# ui allocates its fields in `ui.init`, not on import
+from linkage_ti import cases, ui
+from linkage_ti.linkage import Linkage
+
+# arch names this taichi version knows of
+archs = [arch for arch in ["cpu", "x64", "arm64", "cuda", "vulkan", "metal", "opengl", "gles", "dx11", "dx12", "amdgpu",
+                           "gpu"] if hasattr(ti, arch)]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Leafall Linkage")
+    parser.add_argument("case", nargs="?", default="taichi",
+                        choices=[factory.__name__ for factory in cases.factories] + ["gallery"],
+                        help="factory in linkage_ti/cases.py")
+    parser.add_argument("params", nargs="*", type=float, help="arguments passed to the factory")
+    parser.add_argument("--arch", choices=archs, default="cpu", help="taichi arch")
+    parser.add_argument("--threads", type=int, default=None, help="cpu_max_num_threads of taichi")
+    parser.add_argument("--mode", choices=["window", "headless", "solve"], default="window",
+                        help="show a window, paint frames without a window, or only solve")
+    parser.add_argument("--steps", type=int, default=1000, help="steps (frames) to run in headless/solve mode")
+    parser.add_argument("--precision", choices=["f32", "f64"], default="f32", help="solve precision")
+    parser.add_argument("--vertex-colors", action="store_true", help="paint vertices and bars in their own colors")
+    parser.add_argument("--backend", choices=["software", "ggui"], default="software",
+                        help="paint into a pixel buffer, or draw with GGUI circles and lines")
+    parser.add_argument("--velocity-colors", action="store_true", help="paint vertices and bars by their speed")
+    args = parser.parse_args()
+    try:
+        inspect.signature(getattr(cases, args.case)).bind(*args.params)
+    except TypeError as e:
+        parser.error(f"{args.case}: {e}")
+    return args
+
+
+def run_solve(linkage, steps: int):
+    linkage.substep(0)  # warm up, compiles kernels
+    start = time.perf_counter()
+    for step in range(steps):
+        linkage.substep(step)
+    ti.sync()
+    elapsed = time.perf_counter() - start
+    print(f"solve: {steps} steps in {elapsed:.3f}s, {steps / elapsed:.1f} steps/s")
+
+
+def run_headless(linkage, steps: int, vertexColors: bool, velocityColors: bool):
+    trackedPoints = ui.create_tracked_points(linkage)
+    driverColor = ti.math.vec3(ti.hex_to_rgb(0xd88c9a))
+    trackColor = ti.math.vec3(ti.hex_to_rgb(0x38a3a5))
+    lineColor = ti.math.vec3(ti.hex_to_rgb(0x22577a))
+    cursor = ti.math.vec2(-1e6, -1e6)
+    colors = linkage.get_colors() if vertexColors else None
+    if velocityColors:
+        linkage.enable_kinematics()
+        colors = ti.Vector.field(3, dtype=ti.f32, shape=linkage.N)
+
+    def frame(step: int):
+        if velocityColors:
+            ui.speed_colors(linkage.get_velocities(), colors, lineColor, ui.yellow)
+        if step < 120:
+            ui.get_tracked_points(linkage.get_vertices(), linkage.get_istracked(), trackedPoints, step)
+        ui.paint_frame(linkage, step, trackedPoints, cursor, 0, 0, driverColor, trackColor, lineColor, 0.7, 20, 10,
+                       15, colors)
+        ui.pixels.to_numpy()  # what `canvas.set_image` would read back
+
+    linkage.substep(0)
+    frame(0)  # warm up, compiles kernels
+
+    solving = 0.0
+    start = time.perf_counter()
+    for step in range(steps):
+        solveStart = time.perf_counter()
+        linkage.substep(step)
+        solving += time.perf_counter() - solveStart
+        frame(step)
+    elapsed = time.perf_counter() - start
+    print(f"headless: {steps} frames in {elapsed:.3f}s, {steps / elapsed:.1f} frames/s, "
+          f"{steps / solving:.1f} steps/s")
 
 
 def main():
-    linkage = cases.taichi()
-    ui.show(linkage)
+    args = parse_args()
+    options = {"arch": getattr(ti, args.arch)}
+    if args.threads is not None:
+        options["cpu_max_num_threads"] = args.threads
+    ui.init(**options)
+
+    Linkage.default_precision = ti.f64 if args.precision == "f64" else ti.f32
+    linkage = getattr(cases, args.case)(*args.params)
+
+    if args.mode == "window":
+        ui.show(linkage, args.vertex_colors, args.velocity_colors, args.backend)
+    elif args.mode == "headless":
+        run_headless(linkage, args.steps, args.vertex_colors, args.velocity_colors)
+    else:
+        run_solve(linkage, args.steps)
 
 
 if __name__ == '__main__':